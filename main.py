@@ -1,4 +1,5 @@
 import pygame
+import numpy as np
 import sys
 from enum import Enum 
 import os 
@@ -33,6 +34,13 @@ ZUMBI_VIDA_INICIAL = 4
 ZUMBI_VELOCIDADE = 1.0
 ZOMBIE_ANIMATION_SPEED_MS = 150 
 
+PARTICULAS_MAX = 20000
+PARTICULA_GRAVIDADE = 0.25
+PARTICULA_TAMANHO = 2
+PARTICULAS_IMPACTO = 40
+PARTICULAS_MORTE_ZUMBI = 400
+PARTICULAS_MORTE_JOGADOR = 600
+
 def resource_path(relative_path):
     try:
         base_path = sys._MEIPASS
@@ -40,6 +48,13 @@ def resource_path(relative_path):
         base_path = os.path.abspath(".")
     return os.path.join(base_path, "assets", relative_path)
 
+def build_masks(frames):
+    masks = {}
+    for frame in frames:
+        if frame not in masks:
+            masks[frame] = pygame.mask.from_surface(frame)
+    return masks
+
 class GameState(Enum):
     MENU = 1
     PLAYING = 2
@@ -76,7 +91,74 @@ class Projectile:
     def draw(self, surface):
         pygame.draw.rect(surface, AMARELO, self.rect)
 
+class ParticleSystem:
+    def __init__(self, capacity=PARTICULAS_MAX):
+        self.capacity = capacity
+        self.count = 0
+        self.pos = np.zeros((capacity, 2), dtype=np.float32)
+        self.vel = np.zeros((capacity, 2), dtype=np.float32)
+        self.life = np.zeros(capacity, dtype=np.int32)
+        self.color = np.zeros((capacity, 3), dtype=np.uint8)
+        self.rng = np.random.default_rng()
+
+    def clear(self):
+        self.count = 0
+
+    def emit(self, x, y, amount, cor, speed, lifetime):
+        amount = min(amount, self.capacity - self.count)
+        if amount <= 0:
+            return
+        start = self.count
+        end = start + amount
+        angles = self.rng.uniform(0.0, 2.0 * np.pi, amount)
+        speeds = self.rng.uniform(0.2, 1.0, amount) * speed
+        self.pos[start:end, 0] = x
+        self.pos[start:end, 1] = y
+        self.vel[start:end, 0] = np.cos(angles) * speeds
+        self.vel[start:end, 1] = np.sin(angles) * speeds
+        self.life[start:end] = self.rng.integers(lifetime // 2, lifetime + 1, amount)
+        jitter = self.rng.integers(-40, 41, (amount, 3))
+        self.color[start:end] = np.clip(np.array(cor) + jitter, 0, 255)
+        self.count = end
+
+    def update(self):
+        n = self.count
+        if n == 0:
+            return
+        self.vel[:n, 1] += PARTICULA_GRAVIDADE
+        self.pos[:n] += self.vel[:n]
+        self.life[:n] -= 1
+        alive = self.life[:n] > 0
+        alive &= (self.pos[:n, 0] >= 0) & (self.pos[:n, 0] < LARGURA_TELA)
+        alive &= self.pos[:n, 1] < ALTURA_TELA
+        k = int(np.count_nonzero(alive))
+        if k < n:
+            self.pos[:k] = self.pos[:n][alive]
+            self.vel[:k] = self.vel[:n][alive]
+            self.life[:k] = self.life[:n][alive]
+            self.color[:k] = self.color[:n][alive]
+            self.count = k
+
+    def draw(self, surface):
+        n = self.count
+        if n == 0:
+            return
+        w, h = surface.get_size()
+        xs = self.pos[:n, 0].astype(np.intp)
+        ys = self.pos[:n, 1].astype(np.intp)
+        visible = (xs >= 0) & (xs <= w - PARTICULA_TAMANHO) & (ys >= 0) & (ys <= h - PARTICULA_TAMANHO)
+        xs = xs[visible]
+        ys = ys[visible]
+        colors = self.color[:n][visible]
+        pixels = pygame.surfarray.pixels3d(surface)
+        for dx in range(PARTICULA_TAMANHO):
+            for dy in range(PARTICULA_TAMANHO):
+                pixels[xs + dx, ys + dy] = colors
+        del pixels
+
 class Zombie:
+    _shared_frames = None
+
     def __init__(self, x, y):
         self.rect = pygame.Rect(x, y, ZUMBI_LARGURA, ZUMBI_ALTURA)
         self.pos_x = float(self.rect.x)
@@ -94,24 +176,35 @@ class Zombie:
         self.current_frame_index = 0
         self.last_animation_update = pygame.time.get_ticks()
         self.walk_frame_count = 0 
+        self.masks = {}
         
         self._load_sprites() 
 
     def _load_sprites(self):
+        if Zombie._shared_frames is None:
+            Zombie._shared_frames = self._load_frame_set()
+        (self.idle_frame_right, self.idle_frame_left,
+         self.walk_frames_right, self.walk_frames_left,
+         self.masks) = Zombie._shared_frames
+        self.walk_frame_count = len(self.walk_frames_right)
+
+    def _load_frame_set(self):
         fallback_surface = pygame.Surface((ZUMBI_LARGURA, ZUMBI_ALTURA))
         fallback_surface.fill(VERMELHO) 
+        walk_frames_right = []
+        walk_frames_left = []
         try:
             path_idle = resource_path('zombie_idle.png') 
             idle_original = pygame.image.load(path_idle).convert_alpha()
-            self.idle_frame_right = pygame.transform.scale(
+            idle_frame_right = pygame.transform.scale(
                 idle_original, (ZUMBI_LARGURA, ZUMBI_ALTURA)
             )
-            self.idle_frame_left = pygame.transform.flip(
-                self.idle_frame_right, True, False
+            idle_frame_left = pygame.transform.flip(
+                idle_frame_right, True, False
             )
         except Exception as e:
-            self.idle_frame_right = fallback_surface
-            self.idle_frame_left = pygame.transform.flip(fallback_surface, True, False)
+            idle_frame_right = fallback_surface
+            idle_frame_left = pygame.transform.flip(fallback_surface, True, False)
         i = 1
         while True:
             try:
@@ -121,19 +214,22 @@ class Zombie:
                 walk_scaled = pygame.transform.scale(
                     walk_original, (ZUMBI_LARGURA, ZUMBI_ALTURA)
                 )
-                self.walk_frames_right.append(walk_scaled)
-                self.walk_frames_left.append(
+                walk_frames_right.append(walk_scaled)
+                walk_frames_left.append(
                     pygame.transform.flip(walk_scaled, True, False)
                 )
                 i += 1
             except FileNotFoundError:
                 break 
 
-        self.walk_frame_count = len(self.walk_frames_right)
-        if self.walk_frame_count == 0:
-            self.walk_frames_right = [self.idle_frame_right]
-            self.walk_frames_left = [self.idle_frame_left]
-            self.walk_frame_count = 1
+        if len(walk_frames_right) == 0:
+            walk_frames_right = [idle_frame_right]
+            walk_frames_left = [idle_frame_left]
+
+        masks = build_masks(
+            [idle_frame_right, idle_frame_left] + walk_frames_right + walk_frames_left
+        )
+        return idle_frame_right, idle_frame_left, walk_frames_right, walk_frames_left, masks
 
     def take_damage(self, amount):
         if not self.alive: return
@@ -214,21 +310,22 @@ class Zombie:
         self.rect.x = round(self.pos_x)
         self.rect.y = round(self.pos_y)
 
+    def _current_image(self):
+        if self.direction == 1: 
+            if self.is_moving:
+                return self.walk_frames_right[self.current_frame_index]
+            return self.idle_frame_right
+        if self.is_moving:
+            return self.walk_frames_left[self.current_frame_index]
+        return self.idle_frame_left
+
+    def get_mask(self):
+        return self.masks[self._current_image()]
+
     def draw(self, surface):
         if not self.alive: 
             return 
-        image_to_draw = None
-        if self.direction == 1: 
-            if self.is_moving:
-                image_to_draw = self.walk_frames_right[self.current_frame_index]
-            else:
-                image_to_draw = self.idle_frame_right
-        else: 
-            if self.is_moving:
-                image_to_draw = self.walk_frames_left[self.current_frame_index]
-            else:
-                image_to_draw = self.idle_frame_left
-        surface.blit(image_to_draw, self.rect)
+        surface.blit(self._current_image(), self.rect)
 
 class Platform:
     def __init__(self, x, y, width, height, tile_image_name):
@@ -263,6 +360,8 @@ class Platform:
             current_x += self.tile_width
 
 class Player:
+    _shared_frames = None
+
     def __init__(self, x, y):
         self.rect = pygame.Rect(x, y, PLAYER_LARGURA, PLAYER_ALTURA)
         self.pos_x = float(self.rect.x)
@@ -285,24 +384,37 @@ class Player:
         self.idle_frame_left = None
         self.death_frames = [] 
         self.death_frame_count = 0 
+        self.masks = {}
 
         self._load_sprites()
             
     def _load_sprites(self):
+        if Player._shared_frames is None:
+            Player._shared_frames = self._load_frame_set()
+        (self.idle_frame_right, self.idle_frame_left,
+         self.run_frames_right, self.run_frames_left,
+         self.death_frames, self.masks) = Player._shared_frames
+        self.run_frame_count = len(self.run_frames_right)
+        self.death_frame_count = len(self.death_frames)
+
+    def _load_frame_set(self):
         fallback_surface = pygame.Surface((PLAYER_LARGURA, PLAYER_ALTURA))
         fallback_surface.fill((0, 0, 255)) 
+        run_frames_right = []
+        run_frames_left = []
+        death_frames = []
         try:
             path_idle = resource_path('john_stopped.png') 
             idle_original = pygame.image.load(path_idle).convert_alpha()
-            self.idle_frame_right = pygame.transform.scale(
+            idle_frame_right = pygame.transform.scale(
                 idle_original, (PLAYER_LARGURA, PLAYER_ALTURA)
             )
-            self.idle_frame_left = pygame.transform.flip(
-                self.idle_frame_right, True, False
+            idle_frame_left = pygame.transform.flip(
+                idle_frame_right, True, False
             )
         except Exception as e:
-            self.idle_frame_right = fallback_surface
-            self.idle_frame_left = fallback_surface
+            idle_frame_right = fallback_surface
+            idle_frame_left = fallback_surface
 
         i = 1
 
@@ -314,8 +426,8 @@ class Player:
                 run_scaled = pygame.transform.scale(
                     run_original, (PLAYER_LARGURA, PLAYER_ALTURA)
                 )
-                self.run_frames_right.append(run_scaled)
-                self.run_frames_left.append(
+                run_frames_right.append(run_scaled)
+                run_frames_left.append(
                     pygame.transform.flip(run_scaled, True, False)
                 )
                 i += 1
@@ -324,11 +436,9 @@ class Player:
             except Exception as e:
                 break 
 
-        self.run_frame_count = len(self.run_frames_right)
-        if self.run_frame_count == 0:
-            self.run_frames_right = [self.idle_frame_right]
-            self.run_frames_left = [self.idle_frame_left]
-            self.run_frame_count = 1
+        if len(run_frames_right) == 0:
+            run_frames_right = [idle_frame_right]
+            run_frames_left = [idle_frame_left]
         i = 1
         while True:
             try:
@@ -338,17 +448,20 @@ class Player:
                 death_scaled = pygame.transform.scale(
                     death_original, (PLAYER_LARGURA, PLAYER_ALTURA) 
                 )
-                self.death_frames.append(death_scaled)
+                death_frames.append(death_scaled)
                 i += 1
             except FileNotFoundError:
                 break 
             except Exception as e:
                 break 
 
-        self.death_frame_count = len(self.death_frames)
-        if self.death_frame_count == 0:
-            self.death_frames = [self.idle_frame_right] 
-            self.death_frame_count = 1
+        if len(death_frames) == 0:
+            death_frames = [idle_frame_right] 
+
+        masks = build_masks(
+            [idle_frame_right, idle_frame_left] + run_frames_right + run_frames_left + death_frames
+        )
+        return idle_frame_right, idle_frame_left, run_frames_right, run_frames_left, death_frames, masks
 
     def handle_input(self, event):
         if self.state != "ALIVE": 
@@ -445,19 +558,27 @@ class Player:
         self.rect.x = round(self.pos_x)
         self.rect.y = round(self.pos_y)
 
-    def draw(self, surface):
-        image_to_draw = None
+    def _current_image(self):
         if self.state == "ALIVE":
             if self.direction == 1: 
-                if self.is_moving: image_to_draw = self.run_frames_right[self.current_frame_index]
-                else: image_to_draw = self.idle_frame_right
+                if self.is_moving: return self.run_frames_right[self.current_frame_index]
+                else: return self.idle_frame_right
             else: 
-                if self.is_moving: image_to_draw = self.run_frames_left[self.current_frame_index]
-                else: image_to_draw = self.idle_frame_left
+                if self.is_moving: return self.run_frames_left[self.current_frame_index]
+                else: return self.idle_frame_left
         elif self.state == "DYING":
             frame_index = min(self.current_frame_index, self.death_frame_count - 1)
-            image_to_draw = self.death_frames[frame_index]
+            return self.death_frames[frame_index]
+        return None
 
+    def get_mask(self):
+        image = self._current_image()
+        if image is None:
+            return None
+        return self.masks[image]
+
+    def draw(self, surface):
+        image_to_draw = self._current_image()
         if image_to_draw:
             surface.blit(image_to_draw, self.rect)
 
@@ -475,6 +596,13 @@ class Game:
         self.plataformas = [] 
         self.zombies = []
         self.projectiles = []
+        self.particles = ParticleSystem(PARTICULAS_MAX)
+        
+        self.rect_tests = 0
+        self.mask_tests = 0
+        self.total_rect_tests = 0
+        self.total_mask_tests = 0
+        self.show_collision_stats = False
         
         self.platform_tile_name = "platform_tile.png" 
         self.background_tile_name = "platform_background.png" 
@@ -511,6 +639,7 @@ class Game:
         self.text_renderer.draw(self.tela, "W - Pular", 30, BRANCO, LARGURA_TELA // 2, ALTURA_TELA // 2 + 30)
         self.text_renderer.draw(self.tela, "ESPAÇO - Atirar", 30, BRANCO, LARGURA_TELA // 2, ALTURA_TELA // 2 + 60) 
         self.text_renderer.draw(self.tela, "ESC - Voltar ao Menu (no jogo)", 30, BRANCO, LARGURA_TELA // 2, ALTURA_TELA // 2 + 90)
+        self.text_renderer.draw(self.tela, "F3 - Estatísticas de colisão", 30, BRANCO, LARGURA_TELA // 2, ALTURA_TELA // 2 + 120)
         self.text_renderer.draw(self.tela, "Pressione ENTER para começar", 40, BRANCO, LARGURA_TELA // 2, ALTURA_TELA - 100)
         
         pygame.display.flip()
@@ -523,6 +652,9 @@ class Game:
         self.plataformas.clear()
         self.zombies.clear()
         self.projectiles.clear()
+        self.particles.clear()
+        self.total_rect_tests = 0
+        self.total_mask_tests = 0
         
         plat_chao = Platform(x=0, y=ALTURA_TELA - 50, 
                              width=LARGURA_TELA, height=40, 
@@ -572,27 +704,54 @@ class Game:
                 if event.key == pygame.K_ESCAPE: 
                     self.estado_do_jogo = GameState.MENU
                     return 
+                if event.key == pygame.K_F3:
+                    self.show_collision_stats = not self.show_collision_stats
             if self.player and self.player.state == "ALIVE":
                 new_projectile = self.player.handle_input(event)
                 if new_projectile:
                     self.projectiles.append(new_projectile)
                 
+    def _pixel_collide(self, a, b):
+        self.rect_tests += 1
+        if not a.rect.colliderect(b.rect):
+            return False
+        mask_a = a.get_mask()
+        mask_b = b.get_mask()
+        if mask_a is None or mask_b is None:
+            return False
+        self.mask_tests += 1
+        offset = (b.rect.x - a.rect.x, b.rect.y - a.rect.y)
+        return mask_a.overlap(mask_b, offset) is not None
+
     def _handle_collisions(self):
+        self.rect_tests = 0
+        self.mask_tests = 0
         for p in self.projectiles[:]:
             if p.rect.right < 0 or p.rect.left > LARGURA_TELA:
                 self.projectiles.remove(p)
                 continue 
             for z in self.zombies:
-                if z.alive and p.rect.colliderect(z.rect):
+                if not z.alive: continue
+                self.rect_tests += 1
+                if p.rect.colliderect(z.rect):
                     z.take_damage(1) 
+                    self.particles.emit(p.rect.centerx, p.rect.centery,
+                                        PARTICULAS_IMPACTO, AMARELO, 4.0, 20)
+                    if not z.alive:
+                        self.particles.emit(z.rect.centerx, z.rect.centery,
+                                            PARTICULAS_MORTE_ZUMBI, (120, 170, 60), 6.0, 60)
                     self.projectiles.remove(p) 
                     break 
         if self.player and self.player.state == "ALIVE":
             for z in self.zombies:
-                if z.alive and self.player.rect.colliderect(z.rect):
+                if z.alive and self._pixel_collide(self.player, z):
                     self.player.die() 
+                    self.particles.emit(self.player.rect.centerx, self.player.rect.centery,
+                                        PARTICULAS_MORTE_JOGADOR, (200, 20, 20), 7.0, 80)
                     self.estado_do_jogo = GameState.PLAYER_DYING 
                     break 
+        self.total_rect_tests += self.rect_tests
+        self.total_mask_tests += self.mask_tests
                     
     def _check_for_victory(self):
         zumbis_vivos = [z for z in self.zombies if z.alive]
@@ -608,6 +767,7 @@ class Game:
         if self.estado_do_jogo == GameState.PLAYING:
             for z in self.zombies:
                 z.update(self.player.rect, self.plataformas, self.zombies)
+        self.particles.update()
             
     def _draw_entities(self):
         for plat in self.plataformas:
@@ -618,6 +778,14 @@ class Game:
             p.draw(self.tela)
         if self.player: 
             self.player.draw(self.tela)
+        self.particles.draw(self.tela)
+        if self.show_collision_stats:
+            self._draw_collision_stats()
+
+    def _draw_collision_stats(self):
+        self.text_renderer.draw(self.tela, f"Testes de colisão (rect): {self.rect_tests} / total {self.total_rect_tests}", 22, BRANCO, 10, 10, center=False)
+        self.text_renderer.draw(self.tela, f"Testes de máscara: {self.mask_tests} / total {self.total_mask_tests}", 22, BRANCO, 10, 30, center=False)
+        self.text_renderer.draw(self.tela, f"Partículas: {self.particles.count} / {self.particles.capacity}", 22, BRANCO, 10, 50, center=False)
         
     def _run_game(self):
         self._handle_game_events()
@@ -637,6 +805,7 @@ class Game:
                 return
         if self.player:
              self.player.update(self.plataformas) 
+        self.particles.update()
         self._draw_background()
         self._draw_entities() 
         pygame.display.flip()